@@ -3,9 +3,6 @@ import pandas as pd
 import plotly.express as px
 from datetime import datetime
 from streamlit_plotly_events import plotly_events
-import matplotlib.pyplot as plt
-from pypalettes import load_cmap
-import seaborn as sns
 
 st.set_page_config(
     page_title="Dr.Ilan's Dashboard",
@@ -16,7 +13,6 @@ st.set_page_config(
 st.markdown(
     "<style>div.block-container{padding-top:1rem;}</style>", unsafe_allow_html=True
 )
-cmap = load_cmap("Abbott")
 
 hide_st_style = """
                 <style>
@@ -52,6 +48,7 @@ st.markdown(
 )
 
 
+@st.cache_data
 def load_data():
     try:
         df = pd.read_csv(
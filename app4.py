@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from datetime import datetime
 from streamlit_plotly_events import plotly_events
-import matplotlib.pyplot as plt
-from pypalettes import load_cmap
-import seaborn as sns
+from pacs_ingest import POLL_SECONDS
+from revenue_sections import (
+    department_section,
+    doctor_section,
+    filter_key,
+    get_filter_options,
+    ingestion_active,
+    kpi_section,
+    revenue_trend_section,
+    segment_section,
+    service_section,
+)
 
 
 st.set_page_config(
@@ -16,124 +24,83 @@ st.set_page_config(
 )
 
 
-@st.cache_data
-def load_data():
-    try:
-        df = pd.read_csv(
-            "PRmayjun.csv",
-            encoding="utf-8",
-            dtype={"BillDate": "object"},
-            parse_dates=["BillDate"],
-            dayfirst=True,
-            date_parser=lambda x: pd.to_datetime(x, dayfirst=True),
-        )
-        df["BillDate"] = pd.to_datetime(df["BillDate"], format="%d/%m/%Y")
-    except UnicodeDecodeError:
-        df = pd.read_csv(
-            "PRmayjun.csv",
-            encoding="latin1",
-            dtype={"BillDate": "object"},
-            parse_dates=["BillDate"],
-            dayfirst=True,
-            date_parser=lambda x: pd.to_datetime(x, dayfirst=True),
-        )
-        df["BillDate"] = pd.to_datetime(df["BillDate"], format="%d/%m/%Y")
-    return df
+def stable_default(name, default, options=None):
+    # Streamlit 1.25 derives a widget's ID from its options and default even
+    # when it has a key, so a PACS batch that adds a day, department or doctor
+    # recreates the widget and would drop the user's choice. When that happens
+    # the current choice becomes the new default; otherwise the previous
+    # default is reused so the widget keeps its ID.
+    signature = (default, options)
+    saved = st.session_state.get(f"_default_{name}")
+    if saved is not None and saved[0] == signature:
+        return saved[1]
+    value = default
+    if saved is not None and name in st.session_state:
+        current = list(st.session_state[name])
+        if current != list(saved[0][0]):
+            value = current
+    if options is not None:
+        value = [item for item in value if item in options]
+    st.session_state[f"_default_{name}"] = (signature, value)
+    return value
 
 
-# Load Data
-df = load_data()
+def main():
+    # Rerun periodically so an open dashboard picks up PACS batches; with no
+    # new batch every section is served from cache.
+    if ingestion_active():
+        from streamlit_autorefresh import st_autorefresh
 
-# Sidebar
-leftcol, midcol, rightcol = st.columns(3)
+        st_autorefresh(interval=POLL_SECONDS * 1000, key="pacs_refresh")
 
-with leftcol:
-    date_range = st.date_input(
-        "Date range", [df["BillDate"].min(), df["BillDate"].max()]
-    )
-start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
+    options = get_filter_options()
 
-with midcol:
-    departments = st.multiselect(
-        "Select Departments", ["All"] + df["OrderDepartment"].unique().tolist()
-    )
+    # Sidebar
+    leftcol, midcol, rightcol = st.columns(3)
 
-with rightcol:
-    if "All" in departments or not departments:
-        doctors = st.multiselect(
-            "Select Doctors", ["All"] + df["OrderDoctor"].unique().tolist()
+    with leftcol:
+        date_range = st.date_input(
+            "Date range",
+            stable_default(
+                "date_range",
+                [options["min_date"].date(), options["max_date"].date()],
+            ),
+            key="date_range",
         )
-    else:
+    start_date, end_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[-1])
+
+    with midcol:
+        department_options = ["All"] + options["departments"]
+        departments = st.multiselect(
+            "Select Departments",
+            department_options,
+            stable_default("departments", [], department_options),
+            key="departments",
+        )
+
+    with rightcol:
+        if "All" in departments or not departments:
+            doctor_options = ["All"] + options["doctors"]
+        else:
+            department_doctors = []
+            for department in departments:
+                department_doctors += options["doctors_by_department"][department]
+            doctor_options = ["All"] + list(dict.fromkeys(department_doctors))
         doctors = st.multiselect(
             "Select Doctors",
-            ["All"]
-            + df[df["OrderDepartment"].isin(departments)]["OrderDoctor"]
-            .unique()
-            .tolist(),
+            doctor_options,
+            stable_default("doctors", [], doctor_options),
+            key="doctors",
         )
 
-# Filter Data
-filtered_df = df[(df["BillDate"] >= start_date) & (df["BillDate"] <= end_date)]
-
-if "All" not in departments:
-    filtered_df = filtered_df[filtered_df["OrderDepartment"].isin(departments)]
-
-if "All" not in doctors:
-    filtered_df = filtered_df[filtered_df["OrderDoctor"].isin(doctors)]
-
-# Header and Search
-col1, col2 = st.columns([1, 2])
-with col1:
-    st.header("Dr.Ilan's Dashboard")
-with col2:
-    search_term = st.text_input("Search")
-
-def get_kpi_metrics(df):
-    current_date = pd.to_datetime(datetime.now().date())
-    current_month = current_date.to_period("M")
-    current_year = current_date.year
-    last_year = current_year - 1
-
-    ftd_df = df[df["BillDate"] == current_date]
-    ftd_revenue = ftd_df["Net"].sum()
-
-    mtd_df = df[df["BillDate"].dt.to_period("M") == current_month]
-    mtd_revenue = mtd_df["Net"].sum()
-
-    lysmtd_df = df[
-        (df["BillDate"].dt.year == last_year)
-        & (df["BillDate"].dt.month == current_date.month)
-    ]
-    lysmtd_revenue = lysmtd_df["Net"].sum()
-
-    ytd_df = df[df["BillDate"].dt.year == current_year]
-    ytd_revenue = ytd_df["Net"].sum()
-
-    lytd_df = df[df["BillDate"].dt.year == last_year]
-    lytd_revenue = lytd_df["Net"].sum()
-
-    return {
-        "FTD": ftd_revenue,
-        "MTD": mtd_revenue,
-        "LYSMTD": lysmtd_revenue,
-        "YTD": ytd_revenue,
-        "LYTD": lytd_revenue,
-    }
+    # Header and Search
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.header("Dr.Ilan's Dashboard")
+    with col2:
+        search_term = st.text_input("Search", key="search")
 
-    
-def main():
-    df = load_data()
-
-   
-    search_term = st.text_input("Search")
-    if search_term:
-           filtered_df = filtered_df[
-            filtered_df.apply(
-                lambda row: search_term.lower()
-                in row.astype(str).str.lower().to_string(),
-                axis=1,
-            )
-        ]
+    key = filter_key(start_date, end_date, departments, doctors, search_term)
 
     default_freq = "D"
 
@@ -153,23 +120,12 @@ def main():
 
         freq = st.session_state.freq
         if freq:
-            df_resampled = filtered_df.resample(freq, on="BillDate").sum().reset_index()
-            fig = px.line(
-                df_resampled,
-                x="BillDate",
-                y="Net",
-                title=f"Revenue ({freq})",
-                template="plotly_white",
-                color_discrete_sequence=px.colors.qualitative.Plotly,
-            )
-            fig.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)",
-            )
+            fig = revenue_trend_section(key, freq)
             st.markdown('<div class="scrollable-graph">', unsafe_allow_html=True)
             st.plotly_chart(fig, use_container_width=True)
             st.markdown("</div>", unsafe_allow_html=True)
 
-    kpi_metrics = get_kpi_metrics(filtered_df)
+    kpi_metrics = kpi_section(key, datetime.now().date())
 
     with right:
         st.markdown(
@@ -235,36 +191,15 @@ def main():
                 ),
                 unsafe_allow_html=True,
             )
-        fig = px.pie(
-            filtered_df, values="Net", names="VisitType", title="Segment", hole=0.5
-        )
-        fig.update_traces(text=filtered_df["VisitType"], textposition="inside")
+        fig = segment_section(key)
 
         st.plotly_chart(fig, use_container_width=True)
 
-    filtered_df.sort_values(by=["OrderDepartment", "OrderDoctor"], inplace=True)
-
     # Department wise revenue starts here
     col1, col2 = st.columns(2)
 
     with col1:
-    
-        department_revenue = (
-            filtered_df.groupby("OrderDepartment")["Net"]
-            .sum()
-            .reset_index()
-            .sort_values(by="Net")
-        )
-        fig1 = px.bar(
-            department_revenue,
-            x="Net",
-            y="OrderDepartment",
-            orientation="h",
-            title="Department wise Revenue",
-            color_discrete_sequence=["#0083B8"] * len(department_revenue),
-            template="plotly_white",
-        )
-        fig1.update_layout(plot_bgcolor="rgba(0,0,0,0)", xaxis=(dict(showgrid=False)))
+        fig1 = department_section(key)
 
         selected_points = plotly_events(fig1)
      # st.plotly_chart(fig1, use_container_width=True)
@@ -276,29 +211,7 @@ def main():
     with col2:
         st.subheader("Doctor wise Revenue")
         if selected_department_name:
-            filtered_doctor_df = filtered_df[
-                (filtered_df["OrderDoctor"] != "Prof. Mohamed Rela")
-                & (filtered_df["OrderDepartment"] == selected_department_name)
-            ]
-            doctor_revenue = (
-                filtered_doctor_df.groupby("OrderDoctor")["Net"]
-                .sum()
-                .reset_index()
-                .sort_values(by="Net", ascending=False)
-            )
-            fig2 = px.line(
-                doctor_revenue,
-                x="OrderDoctor",
-                y="Net",
-                title=f"Doctor wise Revenue - {selected_department_name}",
-                markers=True,
-                template="plotly_white",
-                color_discrete_sequence=px.colors.qualitative.Plotly,
-            )
-            fig2.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)",
-                xaxis=(dict(showgrid=False)),
-            )
+            fig2 = doctor_section(key, selected_department_name)
             st.markdown('<div class="scrollable-graph">', unsafe_allow_html=True)
             st.plotly_chart(fig2, use_container_width=True)
             st.markdown("</div>", unsafe_allow_html=True)
@@ -306,20 +219,7 @@ def main():
             st.write("Click on a department bar to see relevant doctor revenue.")
 
     # service wise revenue
-    service_summary = (
-        filtered_df.groupby("ServiceName")
-        .agg({"UHID": "nunique", "Net": "sum"})
-        .reset_index()
-        .rename(columns={"UHID": "Volume"})
-    )
-    fig5 = px.treemap(
-        service_summary,
-        path=["ServiceName"],
-        values="Net",
-        hover_data=["ServiceName"],
-        color="ServiceName",
-        title="Service-wise Revenue Summary",
-    )
+    fig5 = service_section(key)
     st.plotly_chart(fig5, use_container_width=True)
 
     st.subheader("In-Patient Volume")
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from streamlit.elements.plotly_chart import marshall
+from streamlit.proto.PlotlyChart_pb2 import PlotlyChart
+
+# Times what an app4.py rerun costs on the server: the cached sections plus
+# the figure serialisation st.plotly_chart and plotly_events redo on every
+# rerun, even when the figures come from cache. Browser round trip and
+# rendering are not included.
+#
+#   python bench_sections.py [rows]
+#
+# A synthetic PRmayjun.csv is written to a temporary directory, so the real
+# export and the PACS database are left alone.
+#
+# On 500k rows a department click or frequency change stays under the
+# 200 ms target. Changing the date, department or doctor filters or the
+# search term rebuilds every section and does not (roughly 0.2-0.6 s,
+# mostly plotly.express figure construction and the search scan).
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+
+def write_fixture(path, rows):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2023-05-01", "2024-06-30", freq="D")
+    departments = [f"Department {i}" for i in range(40)]
+    df = pd.DataFrame(
+        {
+            "BillDate": rng.choice(dates, rows),
+            "UHID": rng.integers(0, rows // 5, rows).astype(str),
+            "VisitType": rng.choice(["OP", "IP", "ER"], rows),
+            "OrderDepartment": rng.choice(departments, rows),
+            "OrderDoctor": [f"Dr {i}" for i in rng.integers(0, 400, rows)],
+            "ServiceName": [f"Service {i}" for i in rng.integers(0, 300, rows)],
+            "Net": rng.gamma(2.0, 1500.0, rows).round(2),
+        }
+    )
+    df["BillDate"] = df["BillDate"].dt.strftime("%d/%m/%Y")
+    df.to_csv(path, index=False)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    print(f"{label:<28}{(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+def render(rs, key, department=None, freq="D"):
+    charts = [rs.revenue_trend_section(key, freq), rs.segment_section(key)]
+    rs.kpi_section(key, datetime.now().date())
+    # plotly_events serialises the department chart itself.
+    rs.department_section(key).to_json()
+    if department:
+        charts.append(rs.doctor_section(key, department))
+    charts.append(rs.service_section(key))
+    for fig in charts:
+        marshall(PlotlyChart(), fig, True, "streamlit", "streamlit")
+
+
+def main():
+    os.chdir(tempfile.mkdtemp())
+    write_fixture("PRmayjun.csv", ROWS)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import revenue_sections as rs
+
+    print(f"{ROWS} rows")
+    timed("load + warm up", rs.warm_up)
+    options = rs.get_filter_options()
+    key = rs.filter_key(options["min_date"], options["max_date"], [], [], "")
+    timed("first rerun after warm up", lambda: render(rs, key))
+    timed("rerun, nothing changed", lambda: render(rs, key))
+    timed("department click", lambda: render(rs, key, "Department 3"))
+    timed("same click again", lambda: render(rs, key, "Department 3"))
+    timed("frequency change", lambda: render(rs, key, "Department 3", "M"))
+    key = rs.filter_key(options["min_date"], options["max_date"], ["Department 3"], [], "")
+    timed("department filter", lambda: render(rs, key))
+    key = rs.filter_key(options["min_date"], options["max_date"], [], [], "dr 12")
+    timed("search", lambda: render(rs, key))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+
+# Tails billing rows from the PACS interface database into the in-memory
+# dashboard dataset. New rows are picked up by rowid, corrected rows by the
+# modification timestamp column; both are applied as micro-batches.
+#
+#   python pacs_ingest.py [path/to/RMC_PACS_Interface.db]
+#
+# runs a single sync against an empty dataset and prints what it fetched.
+
+PACS_DB = os.environ.get("PACS_DB", "RMC_PACS_Interface.db")
+BILLING_TABLE = os.environ.get("PACS_BILLING_TABLE", "Billing")
+# Set to "" when the table has no modification timestamp; only inserts are
+# captured then.
+MODIFIED_COLUMN = os.environ.get("PACS_MODIFIED_COLUMN", "ModifiedAt")
+POLL_SECONDS = int(os.environ.get("PACS_POLL_SECONDS", "60"))
+BATCH_SIZE = 5000
+# Published versions kept readable by BillingStore.frame(); each is a full
+# copy of the dataset.
+KEEP_VERSIONS = 2
+
+# PACS column -> dashboard column.
+COLUMNS = {
+    "BillDate": "BillDate",
+    "UHID": "UHID",
+    "VisitType": "VisitType",
+    "OrderDepartment": "OrderDepartment",
+    "OrderDoctor": "OrderDoctor",
+    "ServiceName": "ServiceName",
+    "Net": "Net",
+}
+
+
+class BillingStore:
+    # Holds the current dataset. Batches publish a new (version, df) pair in
+    # `snapshot` with a single assignment, so a reader always gets a frame
+    # and the version it belongs to together. Caches keyed on a version must
+    # read that version's frame through frame(), never the latest one.
+
+    def __init__(self, df):
+        self.snapshot = (0, df)
+        self.history = {0: df}
+        # Days before the export's last day are taken from the export. That
+        # last day is treated as partial (the export may have been taken
+        # during it), so PACS rows replace the export's rows for it.
+        self.cutoff = df["BillDate"].max() if len(df) else None
+        self.cutoff_replaced = False
+        self.skipped = 0
+        self.lock = threading.Lock()
+        # Set by start_ingestion once the PACS tail is running.
+        self.tail = None
+
+    def apply(self, batch):
+        with self.lock:
+            df = self.df
+            if "PacsRowId" in df:
+                from_export = df["PacsRowId"].isna()
+                # Drop the previous version of changed rows even when the
+                # correction moves them before the cutoff.
+                stale = df["PacsRowId"].isin(batch["PacsRowId"])
+            else:
+                from_export = pd.Series(True, index=df.index)
+                stale = pd.Series(False, index=df.index)
+            if self.cutoff is not None:
+                early = batch["BillDate"] < self.cutoff
+                self.skipped += int(early.sum())
+                batch = batch[~early]
+                if not self.cutoff_replaced and (batch["BillDate"] == self.cutoff).any():
+                    stale |= from_export & (df["BillDate"] == self.cutoff)
+                    self.cutoff_replaced = True
+            if batch.empty and not stale.any():
+                return 0
+            version = self.version + 1
+            df = pd.concat([df[~stale], batch], ignore_index=True)
+            self.history[version] = df
+            self.history.pop(version - KEEP_VERSIONS, None)
+            self.snapshot = (version, df)
+        return len(batch)
+
+    @property
+    def version(self):
+        return self.snapshot[0]
+
+    @property
+    def df(self):
+        return self.snapshot[1]
+
+    def frame(self, version):
+        # Raises KeyError once `version` is older than KEEP_VERSIONS batches.
+        return self.history[version]
+
+
+def sqlite_order(cursor):
+    # SQLite sorts numbers before text; mirror that so mixed column types
+    # compare the way the cursor query does.
+    modified, rowid = cursor
+    return (isinstance(modified, str), modified, rowid)
+
+
+class PacsTail:
+    def __init__(self, path=PACS_DB, table=BILLING_TABLE, modified=MODIFIED_COLUMN):
+        self.path = path
+        self.table = table
+        self.modified = modified
+        self.last_rowid = 0
+        self.last_modified = None
+        self.last_modified_rowid = 0
+
+    def connect(self):
+        # Read-only so the PACS interface keeps ownership of the file.
+        return closing(sqlite3.connect(f"file:{self.path}?mode=ro", uri=True))
+
+    def missing_columns(self, conn):
+        # SQLite reads an unknown "quoted" identifier as a string literal, so
+        # a schema mismatch would otherwise load column names as data.
+        present = {row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')}
+        required = list(COLUMNS) + ([self.modified] if self.modified else [])
+        return [column for column in required if column not in present]
+
+    def available(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with self.connect() as conn:
+                row = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (self.table,),
+                ).fetchone()
+                missing = self.missing_columns(conn) if row else []
+        except sqlite3.Error:
+            return False
+        if row is None:
+            return False
+        if missing:
+            print(
+                f"WARNING: PACS ingestion disabled, {self.table} in {self.path} "
+                f"has no column(s) {', '.join(missing)}. Adjust COLUMNS or "
+                f"PACS_MODIFIED_COLUMN in pacs_ingest.py."
+            )
+            return False
+        return True
+
+    def select(self):
+        columns = ", ".join(f'"{src}" AS "{dst}"' for src, dst in COLUMNS.items())
+        if self.modified:
+            columns += f', "{self.modified}" AS PacsModified'
+        return f'SELECT rowid AS PacsRowId, {columns} FROM "{self.table}"'
+
+    def fetch_new(self, conn):
+        return pd.read_sql_query(
+            f"{self.select()} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            conn,
+            params=(self.last_rowid, BATCH_SIZE),
+        )
+
+    def fetch_changed(self, conn):
+        # (modified, rowid) is the cursor so rows sharing a timestamp are not
+        # skipped across batch boundaries. Rows past last_rowid are left to
+        # fetch_new.
+        modified = f'"{self.modified}"'
+        if self.last_modified is None:
+            where = f"{modified} IS NOT NULL"
+            params = ()
+        else:
+            where = f"({modified} > ? OR ({modified} = ? AND rowid > ?))"
+            params = (self.last_modified, self.last_modified, self.last_modified_rowid)
+        return pd.read_sql_query(
+            f"{self.select()} WHERE {where} AND rowid <= ? "
+            f"ORDER BY {modified}, rowid LIMIT ?",
+            conn,
+            params=params + (self.last_rowid, BATCH_SIZE),
+        )
+
+    def advance_modified(self, rows):
+        last = rows.sort_values(["PacsModified", "PacsRowId"]).iloc[-1]
+        modified = last["PacsModified"]
+        # Keep the SQLite type (TEXT vs INTEGER) so comparisons still match.
+        modified = modified.item() if hasattr(modified, "item") else modified
+        cursor = (modified, int(last["PacsRowId"]))
+        # Only ever move forward: new rows can carry older stamps, and going
+        # back would re-apply rows (and bump the store version) for nothing.
+        if self.last_modified is None or sqlite_order(cursor) > sqlite_order(
+            (self.last_modified, self.last_modified_rowid)
+        ):
+            self.last_modified, self.last_modified_rowid = cursor
+
+    def poll(self):
+        batches = []
+        with self.connect() as conn:
+            # One read transaction so both queries see the same snapshot.
+            conn.execute("BEGIN")
+            changed = new = None
+            if self.modified:
+                changed = self.fetch_changed(conn)
+                if not changed.empty:
+                    self.advance_modified(changed)
+                    batches.append(changed)
+            new = self.fetch_new(conn)
+            conn.rollback()
+        if not new.empty:
+            self.last_rowid = int(new["PacsRowId"].iloc[-1])
+            batches.append(new)
+            # With no pending changes, nothing at or below the old rowid is
+            # newer than the new rows, so they can move the change cursor too
+            # instead of being re-read by fetch_changed later.
+            if changed is not None and changed.empty:
+                stamped = new.dropna(subset=["PacsModified"])
+                if not stamped.empty:
+                    self.advance_modified(stamped)
+        if not batches:
+            return None
+        batch = pd.concat(batches, ignore_index=True)
+        batch = batch.drop(columns="PacsModified", errors="ignore")
+        batch = batch.drop_duplicates(subset="PacsRowId", keep="last")
+        # KPIs compare BillDate against midnight, so drop any time of day.
+        batch["BillDate"] = pd.to_datetime(
+            batch["BillDate"], dayfirst=True, format="mixed", errors="coerce"
+        ).dt.normalize()
+        return batch.dropna(subset=["BillDate"])
+
+    def sync(self, store):
+        # Drain everything currently pending, one micro-batch at a time.
+        applied = 0
+        skipped = store.skipped
+        while True:
+            batch = self.poll()
+            if batch is None:
+                break
+            applied += store.apply(batch)
+        if store.skipped > skipped:
+            print(
+                f"WARNING: skipped {store.skipped - skipped} PACS row(s) dated "
+                f"before {store.cutoff:%d/%m/%Y}; the CSV export covers those days."
+            )
+        return applied
+
+    def try_sync(self, store):
+        # pandas wraps driver errors (e.g. "database is locked" while PACS is
+        # writing) in its own DatabaseError, which is not a sqlite3.Error.
+        # Anything else is logged too so the poller thread never dies.
+        try:
+            return self.sync(store)
+        except Exception as exc:
+            print(f"PACS ingestion failed, retrying in {POLL_SECONDS}s: {exc!r}")
+            return 0
+
+    def run(self, store, interval=POLL_SECONDS):
+        while True:
+            time.sleep(interval)
+            self.try_sync(store)
+
+
+def start_ingestion(store, path=PACS_DB):
+    tail = PacsTail(path)
+    if not tail.available():
+        return None
+    # Drain the backlog before returning so callers (e.g. serve.py's warm-up)
+    # build their caches against the caught-up version, not one the poller
+    # is about to replace.
+    tail.try_sync(store)
+    store.tail = tail
+    threading.Thread(target=tail.run, args=(store,), daemon=True).start()
+    return tail
+
+
+if __name__ == "__main__":
+    import sys
+
+    tail = PacsTail(sys.argv[1] if len(sys.argv) > 1 else PACS_DB)
+    if not tail.available():
+        sys.exit(f"No usable {BILLING_TABLE} table in {tail.path}")
+    store = BillingStore(pd.DataFrame({"BillDate": pd.to_datetime([])}))
+    print(f"Applied {tail.sync(store)} rows, {store.version} batches")
+    print(store.df.groupby("BillDate")["Net"].sum().tail())
@@ -0,0 +1,315 @@
+import pandas as pd
+import plotly.express as px
+from datetime import datetime
+from functools import lru_cache
+from pacs_ingest import BillingStore, start_ingestion
+
+
+# These caches are plain lru_caches rather than st.cache_data/cache_resource:
+# Streamlit 1.25 only stores cached values while a script run is active, so
+# serve.py could not warm them before the server starts. lru_cache is shared
+# by every session in the process and returns the cached objects themselves,
+# so frames, figures and KPI dicts coming out of this module are read-only.
+@lru_cache(maxsize=None)
+def read_export():
+    try:
+        df = pd.read_csv(
+            "PRmayjun.csv",
+            encoding="utf-8",
+            dtype={"BillDate": "object"},
+            parse_dates=["BillDate"],
+            dayfirst=True,
+            date_parser=lambda x: pd.to_datetime(x, dayfirst=True),
+        )
+        df["BillDate"] = pd.to_datetime(df["BillDate"], format="%d/%m/%Y")
+    except UnicodeDecodeError:
+        df = pd.read_csv(
+            "PRmayjun.csv",
+            encoding="latin1",
+            dtype={"BillDate": "object"},
+            parse_dates=["BillDate"],
+            dayfirst=True,
+            date_parser=lambda x: pd.to_datetime(x, dayfirst=True),
+        )
+        df["BillDate"] = pd.to_datetime(df["BillDate"], format="%d/%m/%Y")
+    return df
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    # The CSV export seeds the dataset; same-day rows are then tailed from the
+    # PACS interface database when it has a usable billing table. The PACS
+    # backlog is applied before this returns, so warm_up() caches the
+    # caught-up version.
+    store = BillingStore(read_export())
+    start_ingestion(store)
+    return store
+
+
+def ingestion_active():
+    return get_store().tail is not None
+
+
+def filter_key(start_date, end_date, departments, doctors, search_term):
+    # Hashable description of the current filter state. Every cached section
+    # below takes this key plus its own inputs, so a widget or click only
+    # recomputes the sections whose arguments actually changed. The store
+    # version makes every section refresh after an ingestion batch.
+    return (
+        get_store().snapshot[0],
+        pd.to_datetime(start_date).date(),
+        pd.to_datetime(end_date).date(),
+        tuple(sorted(departments)),
+        tuple(sorted(doctors)),
+        search_term.strip().lower(),
+    )
+
+
+def build_search_index(df):
+    # One lower-cased string per row, so a new search term is a single
+    # str.contains instead of a pass over every column.
+    index = None
+    # PacsRowId is ingestion bookkeeping, not something users search for.
+    for column in df.columns.drop("PacsRowId", errors="ignore"):
+        text = df[column].astype(str).str.lower()
+        index = text if index is None else index + "\x1f" + text
+    return index
+
+
+@lru_cache(maxsize=2)
+def search_index(version):
+    return build_search_index(get_store().frame(version))
+
+
+@lru_cache(maxsize=8)
+def get_filtered_data(key):
+    # Each entry can be as large as the dataset, so only a handful are kept;
+    # frames from older store versions fall out first.
+    version, start_date, end_date, departments, doctors, search_term = key
+    start_date, end_date = pd.to_datetime(start_date), pd.to_datetime(end_date)
+    # Read the frame published with the key's version, not the latest one:
+    # a batch may have landed since filter_key() ran. If that version has
+    # already been dropped, use the latest frame and its own version.
+    store = get_store()
+    try:
+        df = store.frame(version)
+    except KeyError:
+        version, df = store.snapshot
+    filtered_df = df[(df["BillDate"] >= start_date) & (df["BillDate"] <= end_date)]
+
+    if departments and "All" not in departments:
+        filtered_df = filtered_df[filtered_df["OrderDepartment"].isin(departments)]
+
+    if doctors and "All" not in doctors:
+        filtered_df = filtered_df[filtered_df["OrderDoctor"].isin(doctors)]
+
+    if search_term:
+        try:
+            index = search_index(version)
+        except KeyError:
+            index = build_search_index(df)
+        matches = index.loc[filtered_df.index]
+        filtered_df = filtered_df[matches.str.contains(search_term, regex=False)]
+
+    return filtered_df
+
+
+def get_kpi_metrics(df, current_date=None):
+    if current_date is None:
+        current_date = datetime.now().date()
+    current_date = pd.to_datetime(current_date)
+    current_month = current_date.to_period("M")
+    current_year = current_date.year
+    last_year = current_year - 1
+
+    ftd_df = df[df["BillDate"] == current_date]
+    ftd_revenue = ftd_df["Net"].sum()
+
+    mtd_df = df[df["BillDate"].dt.to_period("M") == current_month]
+    mtd_revenue = mtd_df["Net"].sum()
+
+    lysmtd_df = df[
+        (df["BillDate"].dt.year == last_year)
+        & (df["BillDate"].dt.month == current_date.month)
+    ]
+    lysmtd_revenue = lysmtd_df["Net"].sum()
+
+    ytd_df = df[df["BillDate"].dt.year == current_year]
+    ytd_revenue = ytd_df["Net"].sum()
+
+    lytd_df = df[df["BillDate"].dt.year == last_year]
+    lytd_revenue = lytd_df["Net"].sum()
+
+    return {
+        "FTD": ftd_revenue,
+        "MTD": mtd_revenue,
+        "LYSMTD": lysmtd_revenue,
+        "YTD": ytd_revenue,
+        "LYTD": lytd_revenue,
+    }
+
+
+def get_filter_options():
+    version, df = get_store().snapshot
+    try:
+        return filter_options(version)
+    except KeyError:
+        return build_filter_options(df)
+
+
+@lru_cache(maxsize=4)
+def filter_options(version):
+    return build_filter_options(get_store().frame(version))
+
+
+def build_filter_options(df):
+    return {
+        "min_date": df["BillDate"].min(),
+        "max_date": df["BillDate"].max(),
+        "departments": df["OrderDepartment"].unique().tolist(),
+        "doctors": df["OrderDoctor"].unique().tolist(),
+        "doctors_by_department": df.groupby("OrderDepartment")["OrderDoctor"]
+        .unique()
+        .apply(list)
+        .to_dict(),
+    }
+
+
+# Dashboard sections. Each one is cached on exactly the inputs it reads, so
+# e.g. clicking a department bar only misses the doctor chart cache. On 500k
+# rows (see bench_sections.py) department clicks and frequency changes stay
+# under 200 ms; a new filter or search term rebuilds every section and takes
+# roughly 0.2-0.6 s.
+@lru_cache(maxsize=16)
+def daily_revenue(key):
+    filtered_df = get_filtered_data(key)
+    return filtered_df[["BillDate", "Net"]].resample("D", on="BillDate").sum()
+
+
+@lru_cache(maxsize=64)
+def revenue_trend_section(key, freq):
+    # Month and year totals are rolled up from the cached daily series rather
+    # than resampling the filtered rows again.
+    df_resampled = daily_revenue(key).resample(freq).sum().reset_index()
+    fig = px.line(
+        df_resampled,
+        x="BillDate",
+        y="Net",
+        title=f"Revenue ({freq})",
+        template="plotly_white",
+        color_discrete_sequence=px.colors.qualitative.Plotly,
+    )
+    fig.update_layout(
+        plot_bgcolor="rgba(0,0,0,0)",
+    )
+    return fig
+
+
+@lru_cache(maxsize=64)
+def kpi_section(key, current_date):
+    return get_kpi_metrics(get_filtered_data(key), current_date)
+
+
+@lru_cache(maxsize=64)
+def segment_section(key):
+    segment_revenue = (
+        get_filtered_data(key).groupby("VisitType")["Net"].sum().reset_index()
+    )
+    fig = px.pie(
+        segment_revenue, values="Net", names="VisitType", title="Segment", hole=0.5
+    )
+    fig.update_traces(text=segment_revenue["VisitType"], textposition="inside")
+    return fig
+
+
+@lru_cache(maxsize=64)
+def department_section(key):
+    department_revenue = (
+        get_filtered_data(key)
+        .groupby("OrderDepartment")["Net"]
+        .sum()
+        .reset_index()
+        .sort_values(by="Net")
+    )
+    fig1 = px.bar(
+        department_revenue,
+        x="Net",
+        y="OrderDepartment",
+        orientation="h",
+        title="Department wise Revenue",
+        color_discrete_sequence=["#0083B8"] * len(department_revenue),
+        template="plotly_white",
+    )
+    fig1.update_layout(plot_bgcolor="rgba(0,0,0,0)", xaxis=(dict(showgrid=False)))
+    return fig1
+
+
+@lru_cache(maxsize=16)
+def department_doctor_revenue(key):
+    # Shared by every department click on the same filters, so a click only
+    # slices this table instead of scanning the filtered rows.
+    filtered_df = get_filtered_data(key)
+    return (
+        filtered_df[filtered_df["OrderDoctor"] != "Prof. Mohamed Rela"]
+        .groupby(["OrderDepartment", "OrderDoctor"])["Net"]
+        .sum()
+    )
+
+
+@lru_cache(maxsize=256)
+def doctor_section(key, selected_department_name):
+    revenue = department_doctor_revenue(key)
+    if selected_department_name in revenue.index.get_level_values(0):
+        revenue = revenue.loc[selected_department_name]
+    else:
+        revenue = revenue.iloc[:0].droplevel(0)
+    doctor_revenue = revenue.reset_index().sort_values(by="Net", ascending=False)
+    fig2 = px.line(
+        doctor_revenue,
+        x="OrderDoctor",
+        y="Net",
+        title=f"Doctor wise Revenue - {selected_department_name}",
+        markers=True,
+        template="plotly_white",
+        color_discrete_sequence=px.colors.qualitative.Plotly,
+    )
+    fig2.update_layout(
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=(dict(showgrid=False)),
+    )
+    return fig2
+
+
+@lru_cache(maxsize=64)
+def service_section(key):
+    service_summary = (
+        get_filtered_data(key)
+        .groupby("ServiceName")
+        .agg({"UHID": "nunique", "Net": "sum"})
+        .reset_index()
+        .rename(columns={"UHID": "Volume"})
+    )
+    fig5 = px.treemap(
+        service_summary,
+        path=["ServiceName"],
+        values="Net",
+        hover_data=["ServiceName"],
+        color="ServiceName",
+        title="Service-wise Revenue Summary",
+    )
+    return fig5
+
+
+def warm_up(freq="D"):
+    # Populate the process-wide caches for the default (unfiltered) view so
+    # the first session after a restart is served entirely from cache.
+    options = get_filter_options()
+    key = filter_key(options["min_date"], options["max_date"], [], [], "")
+    search_index(key[0])
+    revenue_trend_section(key, freq)
+    kpi_section(key, datetime.now().date())
+    segment_section(key)
+    department_section(key)
+    department_doctor_revenue(key)
+    service_section(key)
+    return key
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Production entry point for app4.py:
+#
+#   python serve.py [extra streamlit run options]
+#
+# Loads the dataset and the default-view sections into the process-wide
+# revenue_sections caches before the server starts, and exposes /ready on
+# READY_PORT (default 8502) for the load balancer. /ready returns 503 until
+# warm-up has finished and Streamlit's own health check answers.
+
+APP = os.environ.get("DASHBOARD_APP", "app4.py")
+SERVER_PORT = int(os.environ.get("STREAMLIT_SERVER_PORT", "8501"))
+READY_PORT = int(os.environ.get("READY_PORT", "8502"))
+
+warmed = threading.Event()
+
+
+def streamlit_healthy():
+    try:
+        url = f"http://127.0.0.1:{SERVER_PORT}/_stcore/health"
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+class ReadinessHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/ready":
+            self.send_response(404)
+            self.end_headers()
+            return
+        ready = warmed.is_set() and streamlit_healthy()
+        self.send_response(200 if ready else 503)
+        self.end_headers()
+        self.wfile.write(b"ok" if ready else b"warming up")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    readiness = ThreadingHTTPServer(("0.0.0.0", READY_PORT), ReadinessHandler)
+    threading.Thread(target=readiness.serve_forever, daemon=True).start()
+
+    # Imported here so the readiness endpoint is up (and reporting 503)
+    # while pandas, plotly and the dataset load.
+    from revenue_sections import warm_up
+
+    warm_up()
+    warmed.set()
+
+    from streamlit.web import cli
+
+    # No file watcher: a source change would make Streamlit drop
+    # revenue_sections and pacs_ingest from sys.modules, and the re-import
+    # would lose the warmed caches and start a second PACS poller.
+    sys.argv = [
+        "streamlit",
+        "run",
+        APP,
+        "--server.port",
+        str(SERVER_PORT),
+        "--server.fileWatcherType",
+        "none",
+    ] + sys.argv[1:]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import sqlite3
+
+import pandas as pd
+
+import pacs_ingest
+from pacs_ingest import BillingStore, PacsTail, start_ingestion
+
+# Runs the PACS connector against a throwaway SQLite fixture:
+#
+#   python -m pytest -q test_pacs_ingest.py
+
+SCHEMA = (
+    "CREATE TABLE Billing (BillDate TEXT, UHID TEXT, VisitType TEXT, "
+    "OrderDepartment TEXT, OrderDoctor TEXT, ServiceName TEXT, Net REAL, "
+    "ModifiedAt TEXT)"
+)
+
+
+def billing_row(day, net, modified=None):
+    bill_date = f"2024-06-{day:02d} 10:00"
+    return (bill_date, f"U{day}", "OP", "Cardio", "Dr A", "ECG", net, modified or bill_date)
+
+
+def make_fixture(path, rows, schema=SCHEMA):
+    conn = sqlite3.connect(path)
+    conn.execute(schema)
+    conn.executemany(
+        f"INSERT INTO Billing VALUES ({', '.join('?' * len(rows[0]))})", rows
+    )
+    conn.commit()
+    return conn
+
+
+def export_until(day, rows=1):
+    # Stand-in for the CSV export: one row on the day before its last billed
+    # day and `rows` rows on that last day.
+    last = pd.Timestamp(f"2024-06-{day:02d}")
+    dates = [last - pd.Timedelta(days=1)] + [last] * rows
+    return pd.DataFrame(
+        {
+            "BillDate": dates,
+            "UHID": ["X"] * len(dates),
+            "VisitType": ["OP"] * len(dates),
+            "OrderDepartment": ["Cardio"] * len(dates),
+            "OrderDoctor": ["Dr A"] * len(dates),
+            "ServiceName": ["ECG"] * len(dates),
+            "Net": [1.0] * len(dates),
+        }
+    )
+
+
+def test_inserts_updates_and_export_cutoff(tmp_path, monkeypatch):
+    monkeypatch.setattr(pacs_ingest, "BATCH_SIZE", 2)
+    db = tmp_path / "pacs.db"
+    conn = make_fixture(db, [billing_row(day, 100.0 * day) for day in range(1, 6)])
+    store = BillingStore(export_until(2))
+    tail = PacsTail(str(db))
+
+    assert tail.available()
+    # Day 1 is covered by the export; its last day (2) is replaced by PACS.
+    assert tail.sync(store) == 4
+    assert sorted(store.df["PacsRowId"].dropna()) == [2, 3, 4, 5]
+    assert store.df["PacsRowId"].isna().sum() == 1
+    assert store.df["BillDate"].max() == pd.Timestamp("2024-06-05")
+
+    conn.execute("UPDATE Billing SET Net = 999, ModifiedAt = '2024-06-09' WHERE rowid = 4")
+    conn.execute("INSERT INTO Billing VALUES (?, ?, ?, ?, ?, ?, ?, ?)", billing_row(7, 7.0))
+    conn.commit()
+
+    assert tail.sync(store) == 2
+    pacs_rows = store.df.dropna(subset=["PacsRowId"]).set_index("PacsRowId")
+    assert sorted(pacs_rows.index) == [2, 3, 4, 5, 6]
+    assert pacs_rows.loc[4, "Net"] == 999
+    assert len(store.df) == 6
+    assert tail.sync(store) == 0
+
+
+def test_export_last_day_is_replaced_by_pacs(tmp_path, capsys):
+    # The export was taken during its last day (the 10th), so it only has
+    # part of that day's billing. PACS has the full day and keeps going.
+    db = tmp_path / "pacs.db"
+    conn = make_fixture(db, [billing_row(10, net) for net in (100.0, 200.0, 300.0)])
+    store = BillingStore(export_until(10, rows=2))
+    tail = PacsTail(str(db))
+
+    assert tail.sync(store) == 3
+    today = store.df[store.df["BillDate"] == pd.Timestamp("2024-06-10")]
+    assert today["Net"].sum() == 600.0
+    assert today["PacsRowId"].notna().all()
+
+    conn.execute("INSERT INTO Billing VALUES (?, ?, ?, ?, ?, ?, ?, ?)", billing_row(10, 50.0))
+    # A correction to a day the export owns is skipped with a warning.
+    conn.execute("INSERT INTO Billing VALUES (?, ?, ?, ?, ?, ?, ?, ?)", billing_row(9, 5.0))
+    conn.commit()
+    capsys.readouterr()
+
+    assert tail.sync(store) == 1
+    today = store.df[store.df["BillDate"] == pd.Timestamp("2024-06-10")]
+    assert today["Net"].sum() == 650.0
+    assert store.df[store.df["BillDate"] == pd.Timestamp("2024-06-09")]["Net"].sum() == 1.0
+    assert "skipped 1 PACS row(s) dated before 10/06/2024" in capsys.readouterr().out
+
+
+def test_schema_mismatch_is_refused(tmp_path, capsys):
+    db = tmp_path / "pacs.db"
+    make_fixture(
+        db,
+        [("2024-06-03", 10.0)],
+        schema="CREATE TABLE Billing (BillDate TEXT, Net REAL)",
+    )
+    store = BillingStore(export_until(1))
+
+    assert not PacsTail(str(db)).available()
+    assert "UHID" in capsys.readouterr().out
+    assert start_ingestion(store, str(db)) is None
+    assert store.version == 0
+    assert store.tail is None
+
+
+def test_query_errors_do_not_stop_ingestion(tmp_path):
+    db = tmp_path / "pacs.db"
+    conn = make_fixture(db, [billing_row(3, 30.0)])
+    store = BillingStore(export_until(1))
+    tail = PacsTail(str(db))
+    assert tail.available()
+
+    # pandas raises its own DatabaseError here, not sqlite3.Error.
+    conn.execute("ALTER TABLE Billing RENAME TO Billing_old")
+    conn.commit()
+    assert tail.try_sync(store) == 0
+
+    conn.execute("ALTER TABLE Billing_old RENAME TO Billing")
+    conn.commit()
+    assert tail.try_sync(store) == 1
+
+
+def test_start_ingestion_drains_backlog_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(PacsTail, "run", lambda self, store: None)
+    db = tmp_path / "pacs.db"
+    make_fixture(db, [billing_row(day, 10.0) for day in range(2, 5)])
+    store = BillingStore(export_until(1))
+
+    tail = start_ingestion(store, str(db))
+
+    assert store.tail is tail
+    # PACS has nothing for the export's last day, so both export rows stay.
+    assert len(store.df) == 5
+
+
+def test_change_cursor_never_moves_backwards(tmp_path):
+    db = tmp_path / "pacs.db"
+    conn = make_fixture(db, [billing_row(3, 30.0, modified="2024-06-20")])
+    store = BillingStore(export_until(1))
+    tail = PacsTail(str(db))
+    assert tail.sync(store) == 1
+    cursor = (tail.last_modified, tail.last_modified_rowid)
+
+    # A late insert stamped earlier than what has already been seen.
+    conn.execute(
+        "INSERT INTO Billing VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        billing_row(4, 40.0, modified="2024-06-05"),
+    )
+    conn.commit()
+    assert tail.sync(store) == 1
+    assert (tail.last_modified, tail.last_modified_rowid) == cursor
+
+    version = store.version
+    assert tail.sync(store) == 0
+    assert store.version == version
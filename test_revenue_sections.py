@@ -0,0 +1,188 @@
+import pandas as pd
+import pytest
+
+import revenue_sections
+from pacs_ingest import BillingStore
+
+# Checks the cached dashboard sections against small in-memory stores:
+#
+#   python -m pytest -q test_revenue_sections.py
+
+CACHED = [
+    name
+    for name in dir(revenue_sections)
+    if hasattr(getattr(revenue_sections, name), "cache_clear")
+    and name not in ("read_export", "get_store")
+]
+
+
+def billing_frame():
+    return pd.DataFrame(
+        {
+            "BillDate": pd.to_datetime(
+                ["2024-06-01", "2024-06-01", "2024-06-02", "2024-06-03"]
+            ),
+            "UHID": ["U1", "U2", "U3", "U4"],
+            "VisitType": ["OP", "IP", "OP", "OP"],
+            "OrderDepartment": ["Cardio", "Cardio", "Neuro", "Neuro"],
+            "OrderDoctor": ["Dr A", "Dr B", "Dr C", "Dr C"],
+            "ServiceName": ["ECG", "Echo", "MRI", "EEG"],
+            "Net": [100.0, 200.0, 300.0, 400.0],
+        }
+    )
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = BillingStore(billing_frame())
+    monkeypatch.setattr(revenue_sections, "get_store", lambda: store)
+    for name in CACHED:
+        getattr(revenue_sections, name).cache_clear()
+    yield store
+    for name in CACHED:
+        getattr(revenue_sections, name).cache_clear()
+
+
+def pacs_batch(row_id, department, net):
+    return pd.DataFrame(
+        {
+            "PacsRowId": [row_id],
+            "BillDate": pd.to_datetime(["2024-06-04"]),
+            "UHID": ["P"],
+            "VisitType": ["OP"],
+            "OrderDepartment": [department],
+            "OrderDoctor": ["Dr P"],
+            "ServiceName": ["CT"],
+            "Net": [net],
+        }
+    )
+
+
+def test_batch_between_key_and_filtering_reads_the_keyed_version(store):
+    key = revenue_sections.filter_key(
+        "2024-06-01", "2024-06-30", [], [], "neuro"
+    )
+    revenue_sections.search_index(key[0])
+
+    store.apply(pacs_batch(1, "Neuro", 50.0))
+    filtered = revenue_sections.get_filtered_data(key)
+
+    assert list(filtered["UHID"]) == ["U3", "U4"]
+    assert revenue_sections.filter_key("2024-06-01", "2024-06-30", [], [], "neuro")[0] == 1
+
+
+def test_evicted_version_falls_back_to_latest_snapshot(store):
+    key = revenue_sections.filter_key(
+        "2024-06-01", "2024-06-30", [], [], "neuro"
+    )
+    for row_id in range(1, 4):
+        store.apply(pacs_batch(row_id, "Neuro", 10.0 * row_id))
+
+    filtered = revenue_sections.get_filtered_data(key)
+
+    assert len(filtered) == 5
+    assert revenue_sections.get_filter_options()["max_date"] == pd.Timestamp("2024-06-04")
+
+
+# The expected values below are the aggregations app4.py ran inline before
+# it was split into cached sections.
+
+
+def full_key(departments=(), doctors=(), search_term=""):
+    return revenue_sections.filter_key(
+        "2024-06-01", "2024-06-03", list(departments), list(doctors), search_term
+    )
+
+
+def test_filter_key_normalises_equivalent_inputs(store):
+    key = revenue_sections.filter_key(
+        pd.Timestamp("2024-06-01"), "2024-06-03", ["Neuro", "Cardio"], ["Dr C"], " Neuro "
+    )
+    same = revenue_sections.filter_key(
+        pd.to_datetime("2024-06-01").date(), pd.Timestamp("2024-06-03"),
+        ["Cardio", "Neuro"], ["Dr C"], "neuro",
+    )
+    assert key == same
+    assert hash(key) == hash(same)
+
+
+@pytest.mark.parametrize(
+    "departments, doctors, expected",
+    [
+        ((), (), ["U1", "U2", "U3", "U4"]),
+        (("All",), ("All",), ["U1", "U2", "U3", "U4"]),
+        (("Cardio",), (), ["U1", "U2"]),
+        (("Cardio", "Neuro"), ("Dr B", "Dr C"), ["U2", "U3", "U4"]),
+    ],
+)
+def test_filtered_data_matches_baseline_filters(store, departments, doctors, expected):
+    filtered = revenue_sections.get_filtered_data(full_key(departments, doctors))
+    assert list(filtered["UHID"]) == expected
+
+
+def test_search_matches_any_column_case_insensitively(store):
+    assert list(revenue_sections.get_filtered_data(full_key(search_term="ECHO"))["UHID"]) == ["U2"]
+    assert list(revenue_sections.get_filtered_data(full_key(search_term="dr c"))["UHID"]) == ["U3", "U4"]
+
+
+@pytest.mark.parametrize("freq", ["D", "M"])
+def test_revenue_trend_matches_baseline_resample(store, freq):
+    df = billing_frame()
+    expected = df.resample(freq, on="BillDate")["Net"].sum()
+    trace = revenue_sections.revenue_trend_section(full_key(), freq).data[0]
+    assert list(trace.y) == list(expected)
+    assert list(pd.to_datetime(trace.x)) == list(expected.index)
+
+
+def test_kpis_match_baseline(store):
+    metrics = revenue_sections.kpi_section(full_key(), pd.Timestamp("2024-06-02").date())
+    expected = revenue_sections.get_kpi_metrics(billing_frame(), "2024-06-02")
+    assert metrics == expected
+    assert metrics["FTD"] == 300.0
+    assert metrics["MTD"] == 1000.0
+
+
+def test_segment_matches_baseline_pie(store):
+    # The baseline passed every row to px.pie, which sums values per label.
+    expected = billing_frame().groupby("VisitType")["Net"].sum()
+    trace = revenue_sections.segment_section(full_key()).data[0]
+    assert dict(zip(trace.labels, trace.values)) == expected.to_dict()
+
+
+def test_department_matches_baseline_bar(store):
+    expected = (
+        billing_frame().groupby("OrderDepartment")["Net"].sum().reset_index().sort_values(by="Net")
+    )
+    trace = revenue_sections.department_section(full_key()).data[0]
+    assert list(trace.y) == list(expected["OrderDepartment"])
+    assert list(trace.x) == list(expected["Net"])
+
+
+def test_doctor_matches_baseline_and_handles_unknown_department(store, monkeypatch):
+    df = billing_frame()
+    df.loc[1, "OrderDoctor"] = "Prof. Mohamed Rela"
+    df.loc[len(df)] = [pd.Timestamp("2024-06-03"), "U5", "OP", "Cardio", "Dr D", "ECG", 500.0]
+    doctor_store = BillingStore(df)
+    monkeypatch.setattr(revenue_sections, "get_store", lambda: doctor_store)
+    expected = (
+        df[(df["OrderDoctor"] != "Prof. Mohamed Rela") & (df["OrderDepartment"] == "Cardio")]
+        .groupby("OrderDoctor")["Net"]
+        .sum()
+        .reset_index()
+        .sort_values(by="Net", ascending=False)
+    )
+    trace = revenue_sections.doctor_section(full_key(), "Cardio").data[0]
+    assert list(trace.x) == list(expected["OrderDoctor"]) == ["Dr D", "Dr A"]
+    assert list(trace.y) == list(expected["Net"])
+
+    empty = revenue_sections.doctor_section(full_key(), "Ortho").data[0]
+    assert len(empty.x) == 0
+
+
+def test_service_matches_baseline_treemap(store):
+    expected = billing_frame().groupby("ServiceName")["Net"].sum()
+    fig = revenue_sections.service_section(full_key())
+    totals = {}
+    for trace in fig.data:
+        totals.update(zip(trace.labels, trace.values))
+    assert totals == expected.to_dict()